@@ -1,10 +1,21 @@
+import csv
+
 from django.contrib import admin
+from django.http import StreamingHttpResponse
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from django.db.models import BooleanField, Case, Count, Q, Value, When
+from django.db.models.functions import Now
 from .models import Category, VideoLesson, UserAccess, LessonProgress
 
 
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи"""
+    def write(self, value):
+        return value
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'description', 'created_at', 'lesson_count']
@@ -12,14 +23,19 @@ class CategoryAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     
     def lesson_count(self, obj):
-        return obj.videolesson_set.count()
+        return obj._lesson_count
     lesson_count.short_description = 'Количество уроков'
+    lesson_count.admin_order_field = '_lesson_count'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_lesson_count=Count('videolesson'))
 
 
 @admin.register(VideoLesson)
 class VideoLessonAdmin(admin.ModelAdmin):
     list_display = ['title', 'category', 'duration_display', 'is_active', 'created_at', 'access_count']
     list_filter = ['category', 'is_active', 'created_at']
+    list_select_related = ['category']
     search_fields = ['title', 'description']
     readonly_fields = ['created_at', 'updated_at']
     fieldsets = (
@@ -36,26 +52,33 @@ class VideoLessonAdmin(admin.ModelAdmin):
     )
     
     def duration_display(self, obj):
-        return obj.get_duration_display()
+        return obj.duration_display
     duration_display.short_description = 'Длительность'
     
     def access_count(self, obj):
-        count = obj.useraccess_set.filter(is_active=True).count()
         return format_html(
             '<a href="{}">{} пользователей</a>',
             reverse('admin:lessons_useraccess_changelist') + f'?lesson__id__exact={obj.id}',
-            count
+            obj._access_count
         )
     access_count.short_description = 'Доступы'
+    access_count.admin_order_field = '_access_count'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            _access_count=Count('useraccess', filter=Q(useraccess__is_active=True))
+        )
 
 
 @admin.register(UserAccess)
 class UserAccessAdmin(admin.ModelAdmin):
     list_display = ['user', 'lesson', 'is_approved', 'granted_by', 'granted_at', 'expires_at', 'is_active', 'valid_badge']
     list_filter = ['is_approved', 'is_active', 'granted_at', 'expires_at', 'lesson__category']
+    list_select_related = ['user', 'lesson', 'granted_by']
     search_fields = ['user__username', 'user__email', 'lesson__title']
     readonly_fields = ['granted_at']
     date_hierarchy = 'granted_at'
+    actions = ['export_csv']
     
     fieldsets = (
         ('Доступ', {
@@ -75,33 +98,65 @@ class UserAccessAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
     def valid_badge(self, obj):
-        if obj.is_valid():
+        if obj._is_valid:
             return mark_safe('<span style="color: green;">✓ Действителен</span>')
         else:
             return mark_safe('<span style="color: red;">✗ Истек</span>')
     valid_badge.short_description = 'Статус доступа'
+    valid_badge.admin_order_field = '_is_valid'
+    
+    @admin.action(description='Экспортировать в CSV')
+    def export_csv(self, request, queryset):
+        # Строки читаются порциями, чтобы не держать весь экспорт в памяти
+        rows = queryset.values_list(
+            'user__username', 'lesson__title', 'granted_at', 'expires_at', 'is_active'
+        ).iterator(chunk_size=2000)
+        writer = csv.writer(Echo())
+        header = ['Пользователь', 'Урок', 'Дата предоставления', 'Дата истечения', 'Активен']
+        
+        def stream():
+            yield writer.writerow(header)
+            for username, title, granted_at, expires_at, is_active in rows:
+                yield writer.writerow([
+                    username,
+                    title or 'Все уроки',
+                    granted_at.isoformat(),
+                    expires_at.isoformat() if expires_at else '',
+                    is_active,
+                ])
+        
+        response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="user_access.csv"'
+        return response
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user', 'lesson', 'granted_by')
+        # Действительность доступа вычисляется в SQL, как в UserAccess.is_valid()
+        return super().get_queryset(request).annotate(
+            _is_valid=Case(
+                When(is_active=False, then=Value(False)),
+                When(expires_at__isnull=True, then=Value(True)),
+                When(expires_at__gt=Now(), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        )
 
 
 @admin.register(LessonProgress)
 class LessonProgressAdmin(admin.ModelAdmin):
     list_display = ['user', 'lesson', 'progress_percentage', 'is_completed', 'last_watched']
     list_filter = ['is_completed', 'last_watched', 'lesson__category']
+    list_select_related = ['user', 'lesson']
     search_fields = ['user__username', 'lesson__title']
     readonly_fields = ['last_watched']
     date_hierarchy = 'last_watched'
     
     def progress_percentage(self, obj):
-        percentage = obj.get_progress_percentage()
+        percentage = obj.progress_percentage
         color = 'green' if percentage >= 90 else 'orange' if percentage >= 50 else 'red'
         return format_html(
-            '<span style="color: {};">{:.1f}%</span>',
+            '<span style="color: {};">{}%</span>',
             color,
-            percentage
+            f'{percentage:.1f}'
         )
     progress_percentage.short_description = 'Прогресс'
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user', 'lesson')
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
 from .models import VideoLesson, Category, UserAccess
 from django.db.models import Q
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 
@@ -60,8 +61,9 @@ class UserRegistrationForm(UserCreationForm):
     
     def clean_email(self):
         """Проверяем уникальность email"""
-        email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        email = self.cleaned_data.get('email', '').strip().lower()
+        # Сравнение по LOWER(email) использует индекс auth_user_email_lower
+        if User.objects.alias(email_lower=Lower('email')).filter(email_lower=email).exists():
             raise forms.ValidationError('Пользователь с таким email уже существует.')
         return email
     
@@ -141,15 +143,20 @@ class CategoryForm(forms.ModelForm):
 
 
 class UserAccessForm(forms.ModelForm):
-    """Форма для предоставления доступа пользователю"""
+    """Форма для предоставления доступа одному или нескольким пользователям"""
+    users = forms.ModelMultipleChoiceField(
+        queryset=User.objects.none(),
+        label="Пользователи",
+        widget=forms.SelectMultiple(attrs={
+            'class': 'form-control',
+            'size': 8
+        })
+    )
     
     class Meta:
         model = UserAccess
-        fields = ['user', 'expires_at']
+        fields = ['expires_at']
         widgets = {
-            'user': forms.Select(attrs={
-                'class': 'form-control'
-            }),
             'expires_at': forms.DateTimeInput(attrs={
                 'class': 'form-control',
                 'type': 'datetime-local'
@@ -159,7 +166,7 @@ class UserAccessForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Показываем только обычных пользователей (не админов)
-        self.fields['user'].queryset = User.objects.filter(is_staff=False).order_by('username')
+        self.fields['users'].queryset = User.objects.filter(is_staff=False).order_by('username')
         self.fields['expires_at'].required = False
     
     def clean_expires_at(self):
@@ -182,12 +189,14 @@ class UserSearchForm(forms.Form):
     )
     
     def get_users(self):
-        """Возвращает отфильтрованных пользователей"""
-        search = self.cleaned_data.get('search', '')
-        if search:
-            return User.objects.filter(
-                is_staff=False
-            ).filter(
-                Q(username__icontains=search) | Q(email__icontains=search)
-            ).order_by('username')
-        return User.objects.filter(is_staff=False).order_by('username') 
\ No newline at end of file
+        """Возвращает отфильтрованных пользователей (queryset кешируется на форме)"""
+        if not hasattr(self, '_users_cache'):
+            users = User.objects.filter(is_staff=False).only('id', 'username', 'email')
+            search = self.cleaned_data.get('search', '')
+            if search:
+                # На PostgreSQL поиск использует триграммные индексы (миграция 0007)
+                users = users.filter(
+                    Q(username__icontains=search) | Q(email__icontains=search)
+                )
+            self._users_cache = users.order_by('username')
+        return self._users_cache
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-15 21:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0004_remove_useraccess_is_global_useraccess_is_approved'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lessonprogress',
+            index=models.Index(fields=['lesson', 'is_completed'], name='lessons_les_lesson__5efe75_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraccess',
+            index=models.Index(fields=['user', 'is_active', 'is_approved'], name='lessons_use_user_id_792313_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraccess',
+            index=models.Index(fields=['user', 'lesson', 'is_active'], name='lessons_use_user_id_4a018b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraccess',
+            index=models.Index(fields=['expires_at'], name='lessons_use_expires_35f0b0_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-15 22:05
+
+from django.db import migrations
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Триграммные индексы доступны только в PostgreSQL (расширение pg_trgm)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS auth_user_username_trgm ON auth_user USING gin (UPPER(username) gin_trgm_ops);'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS auth_user_email_trgm ON auth_user USING gin (UPPER(email) gin_trgm_ops);'
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS auth_user_username_trgm;')
+    schema_editor.execute('DROP INDEX IF EXISTS auth_user_email_trgm;')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0006_auth_user_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
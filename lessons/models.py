@@ -1,6 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+# Ключ кеша списка категорий (сбрасывается сигналами при изменении категорий)
+CATEGORIES_CACHE_KEY = 'all_categories'
 
 
 class Category(models.Model):
@@ -38,11 +43,16 @@ class VideoLesson(models.Model):
     def __str__(self):
         return self.title
     
-    def get_duration_display(self):
-        """Возвращает длительность в формате MM:SS"""
+    @cached_property
+    def duration_display(self):
+        """Длительность в формате MM:SS"""
         minutes = self.duration // 60
         seconds = self.duration % 60
         return f"{minutes:02d}:{seconds:02d}"
+    
+    def get_duration_display(self):
+        """Возвращает длительность в формате MM:SS"""
+        return self.duration_display
 
 
 class UserAccess(models.Model):
@@ -68,6 +78,11 @@ class UserAccess(models.Model):
         verbose_name = "Доступ пользователя"
         verbose_name_plural = "Доступы пользователей"
         unique_together = ['user', 'lesson']
+        indexes = [
+            models.Index(fields=['user', 'is_active', 'is_approved']),
+            models.Index(fields=['user', 'lesson', 'is_active']),
+            models.Index(fields=['expires_at']),
+        ]
     
     def __str__(self):
         target = self.lesson.title if self.lesson else 'Все уроки'
@@ -94,12 +109,25 @@ class LessonProgress(models.Model):
         verbose_name = "Прогресс урока"
         verbose_name_plural = "Прогресс уроков"
         unique_together = ['user', 'lesson']
+        indexes = [
+            models.Index(fields=['lesson', 'is_completed']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.lesson.title}"
     
+    @staticmethod
+    def calculate_percentage(watched_seconds, duration):
+        """Процент просмотра для заданных секунд и длительности урока"""
+        if not duration:
+            return 0
+        return min(100, (watched_seconds / duration) * 100)
+    
+    @cached_property
+    def progress_percentage(self):
+        """Процент просмотра урока"""
+        return self.calculate_percentage(self.watched_seconds, self.lesson.duration)
+    
     def get_progress_percentage(self):
         """Возвращает процент просмотра урока"""
-        if self.lesson.duration == 0:
-            return 0
-        return min(100, (self.watched_seconds / self.lesson.duration) * 100)
+        return self.progress_percentage
@@ -1,15 +1,58 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.views.generic import ListView, DetailView
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponseForbidden, Http404
 from django.utils import timezone
-from django.db.models import Q
-from .models import VideoLesson, Category, UserAccess, LessonProgress
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Count, Exists, OuterRef
+from django.core.paginator import Paginator
+from django.core.cache import cache
+from .models import VideoLesson, Category, UserAccess, LessonProgress, CATEGORIES_CACHE_KEY
 from .forms import VideoLessonForm, CategoryForm, UserAccessForm, UserRegistrationForm
 
 
+# Поля урока, которые выводятся в списках (без description, video_file и служебных дат)
+LESSON_LIST_FIELDS = (
+    'id', 'title', 'thumbnail', 'duration', 'is_active', 'created_at',
+    'category__id', 'category__name',
+)
+
+
+def lesson_list_queryset(*extra_fields):
+    """Базовый queryset уроков для списков: категория в том же запросе"""
+    return VideoLesson.objects.select_related('category').only(*LESSON_LIST_FIELDS, *extra_fields)
+
+
+def get_user_access_state(request):
+    """Возвращает (has_global, lesson_ids) для текущего пользователя.
+
+    Все действующие доступы читаются одним запросом, результат кешируется
+    на объекте request, чтобы не повторять запрос в рамках одного запроса.
+    """
+    state = getattr(request, '_lesson_access_state', None)
+    if state is None:
+        rows = UserAccess.objects.filter(
+            user=request.user,
+            is_active=True
+        ).filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+        ).values_list('is_approved', 'lesson_id')
+
+        has_global = False
+        lesson_ids = set()
+        for is_approved, lesson_id in rows:
+            if is_approved:
+                has_global = True
+            if lesson_id is not None:
+                lesson_ids.add(lesson_id)
+        state = (has_global, lesson_ids)
+        request._lesson_access_state = state
+    return state
+
+
 class LessonListView(LoginRequiredMixin, ListView):
     """Список доступных уроков"""
     model = VideoLesson
@@ -22,44 +65,43 @@ class LessonListView(LoginRequiredMixin, ListView):
         user = self.request.user
         if user.is_staff:
             # Админы видят все уроки
-            return VideoLesson.objects.filter(is_active=True)
-        else:
-            # Если админ включил глобальный допуск в профиле, показываем все активные уроки
-            # Глобальный доступ через запись UserAccess(is_approved=True)
-            has_global = UserAccess.objects.filter(
-                user=user,
-                is_approved=True,
-                is_active=True
-            ).filter(Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())).exists()
-            if has_global:
-                return VideoLesson.objects.filter(is_active=True)
+            return lesson_list_queryset('description').filter(is_active=True)
 
-            # Иначе показываем только уроки с явным доступом
-            valid_access = UserAccess.objects.filter(
-                user=user,
-                is_active=True
-            ).filter(
-                Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
-            ).values_list('lesson_id', flat=True)
-
-            return VideoLesson.objects.filter(
-                id__in=valid_access,
-                is_active=True
-            )
+        # Уроки с явным доступом или все уроки при глобальном доступе
+        # (UserAccess с is_approved=True) — через EXISTS вместо IN-списка
+        valid_access = UserAccess.objects.filter(
+            user=user,
+            is_active=True
+        ).filter(Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()))
+        return lesson_list_queryset('description').filter(
+            Exists(valid_access.filter(lesson=OuterRef('pk'))) | Exists(valid_access.filter(is_approved=True)),
+            is_active=True
+        )
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        categories = cache.get(CATEGORIES_CACHE_KEY)
+        if categories is None:
+            categories = list(Category.objects.only('id', 'name'))
+            cache.set(CATEGORIES_CACHE_KEY, categories, 300)
+        context['categories'] = categories
+        # Материализуем страницу один раз, чтобы шаблон не выполнял запрос повторно
+        lessons = list(context['lessons'])
+        context['lessons'] = lessons
         context['user_progress'] = {}
         
         if not self.request.user.is_staff:
-            # Получаем прогресс пользователя
-            progress = LessonProgress.objects.filter(
+            # Получаем прогресс пользователя без создания объектов моделей
+            durations = {lesson.id: lesson.duration for lesson in lessons}
+            progress_rows = LessonProgress.objects.filter(
                 user=self.request.user,
-                lesson__in=context['lessons']
-            )
-            for prog in progress:
-                context['user_progress'][prog.lesson.id] = prog
+                lesson_id__in=durations
+            ).values('lesson_id', 'watched_seconds', 'is_completed')
+            for row in progress_rows:
+                row['progress_percentage'] = LessonProgress.calculate_percentage(
+                    row['watched_seconds'], durations[row['lesson_id']]
+                )
+                context['user_progress'][row['lesson_id']] = row
         
         return context
 
@@ -70,6 +112,18 @@ class LessonDetailView(LoginRequiredMixin, DetailView):
     template_name = 'lessons/lesson_detail.html'
     context_object_name = 'lesson'
     
+    def get_queryset(self):
+        return VideoLesson.objects.select_related('category').only(
+            'id', 'title', 'description', 'video_file', 'duration', 'created_at',
+            'category__id', 'category__name',
+        )
+    
+    def get_object(self, queryset=None):
+        """Урок загружается один раз за запрос"""
+        if not hasattr(self, '_object'):
+            self._object = super().get_object(queryset)
+        return self._object
+    
     def dispatch(self, request, *args, **kwargs):
         """Проверяем доступ к уроку"""
         lesson = self.get_object()
@@ -78,42 +132,31 @@ class LessonDetailView(LoginRequiredMixin, DetailView):
         if user.is_staff:
             return super().dispatch(request, *args, **kwargs)
 
-        # Глобальный доступ через запись UserAccess(is_approved=True)
-        has_global = UserAccess.objects.filter(
-            user=user,
-            is_approved=True,
-            is_active=True
-        ).filter(Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())).exists()
-        if has_global:
+        has_global, lesson_ids = get_user_access_state(request)
+        if has_global or lesson.id in lesson_ids:
             return super().dispatch(request, *args, **kwargs)
         
-        # Проверяем явный доступ
-        try:
-            access = UserAccess.objects.get(
-                user=user,
-                lesson=lesson,
-                is_active=True
-            )
-            if not access.is_valid():
-                messages.error(request, "Ваш доступ к этому уроку истек.")
-                return redirect('lessons:lesson_list')
-        except UserAccess.DoesNotExist:
+        # Доступа нет: уточняем причину для сообщения пользователю
+        if UserAccess.objects.filter(user=user, lesson=lesson, is_active=True).exists():
+            messages.error(request, "Ваш доступ к этому уроку истек.")
+        else:
             messages.error(request, "У вас нет доступа к этому уроку.")
-            return redirect('lessons:lesson_list')
-        
-        return super().dispatch(request, *args, **kwargs)
+        return redirect('lessons:lesson_list')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         lesson = self.get_object()
         user = self.request.user
         
-        # Получаем или создаем прогресс
-        progress, created = LessonProgress.objects.get_or_create(
-            user=user,
-            lesson=lesson
-        )
-        context['progress'] = progress
+        # Прогресс только читаем: запись создается при первом update_progress,
+        # для админов прогресс не отслеживается
+        if user.is_staff:
+            context['progress'] = None
+        else:
+            context['progress'] = LessonProgress.objects.filter(
+                user=user,
+                lesson=lesson
+            ).only('is_completed').first()
         
         return context
 
@@ -122,40 +165,68 @@ class LessonDetailView(LoginRequiredMixin, DetailView):
 def update_progress(request, lesson_id):
     """Обновление прогресса просмотра урока"""
     if request.method == 'POST':
-        lesson = get_object_or_404(VideoLesson, id=lesson_id)
-        watched_seconds = int(request.POST.get('watched_seconds', 0))
-        
-        # Проверяем доступ
+        lessons = VideoLesson.objects.filter(id=lesson_id).only('id', 'duration')
         if not request.user.is_staff:
-            try:
-                access = UserAccess.objects.get(
+            # Урок, проверка доступа (явного или глобального) и сохраненный
+            # флаг завершения одним запросом
+            valid_access = UserAccess.objects.filter(
+                user=request.user,
+                is_active=True
+            ).filter(Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()))
+            lessons = lessons.annotate(
+                has_access=Exists(valid_access.filter(lesson=OuterRef('pk'))) | Exists(valid_access.filter(is_approved=True)),
+                was_completed=Exists(LessonProgress.objects.filter(
                     user=request.user,
-                    lesson=lesson,
-                    is_active=True
-                )
-                if not access.is_valid():
-                    return HttpResponseForbidden("Доступ истек")
-            except UserAccess.DoesNotExist:
-                return HttpResponseForbidden("Нет доступа")
+                    lesson=OuterRef('pk'),
+                    is_completed=True
+                ))
+            )
+        lesson = lessons.first()
+        if lesson is None:
+            raise Http404("Урок не найден")
+        watched_seconds = int(request.POST.get('watched_seconds', 0))
         
-        # Обновляем прогресс
-        progress, created = LessonProgress.objects.get_or_create(
-            user=request.user,
-            lesson=lesson
-        )
+        # Проверяем завершение урока (90% просмотра)
+        is_completed = watched_seconds >= lesson.duration * 0.9
+        progress_percentage = LessonProgress.calculate_percentage(watched_seconds, lesson.duration)
         
-        progress.watched_seconds = watched_seconds
+        # Для админов прогресс не отслеживается и не сохраняется
+        if request.user.is_staff:
+            return JsonResponse({
+                'success': True,
+                'progress_percentage': progress_percentage,
+                'is_completed': is_completed
+            })
         
-        # Проверяем завершение урока (90% просмотра)
-        if watched_seconds >= lesson.duration * 0.9:
-            progress.is_completed = True
+        # Проверяем доступ
+        if not lesson.has_access:
+            # Доступа нет: уточняем причину, как в LessonDetailView.dispatch
+            if UserAccess.objects.filter(user=request.user, lesson=lesson, is_active=True).exists():
+                return HttpResponseForbidden("Доступ истек")
+            return HttpResponseForbidden("Нет доступа")
         
-        progress.save()
+        # Обновляем прогресс одним UPDATE; завершение урока не сбрасываем
+        fields = {'watched_seconds': watched_seconds, 'last_watched': timezone.now()}
+        if is_completed:
+            fields['is_completed'] = True
+        progress = LessonProgress.objects.filter(user=request.user, lesson=lesson)
+        if not progress.update(**fields):
+            try:
+                with transaction.atomic():
+                    LessonProgress.objects.create(
+                        user=request.user,
+                        lesson=lesson,
+                        watched_seconds=watched_seconds,
+                        is_completed=is_completed
+                    )
+            except IntegrityError:
+                # Параллельный запрос уже создал запись — обновляем ее
+                progress.update(**fields)
         
         return JsonResponse({
             'success': True,
-            'progress_percentage': progress.get_progress_percentage(),
-            'is_completed': progress.is_completed
+            'progress_percentage': progress_percentage,
+            'is_completed': is_completed or lesson.was_completed
         })
     
     return JsonResponse({'success': False})
@@ -174,34 +245,29 @@ class AdminLessonListView(AdminRequiredMixin, ListView):
     template_name = 'lessons/admin/lesson_list.html'
     context_object_name = 'lessons'
     paginate_by = 20
+    
+    def get_queryset(self):
+        return lesson_list_queryset()
 
 
-@login_required
+@staff_member_required
 def admin_lesson_create(request):
     """Создание нового урока (только для админов)"""
-    if not request.user.is_staff:
-        messages.error(request, "У вас нет прав для создания уроков.")
-        return redirect('lesson_list')
-    
     if request.method == 'POST':
         form = VideoLessonForm(request.POST, request.FILES)
         if form.is_valid():
             lesson = form.save()
             messages.success(request, f"Урок '{lesson.title}' успешно создан.")
-            return redirect('admin_lesson_list')
+            return redirect('lessons:admin_lesson_list')
     else:
         form = VideoLessonForm()
     
     return render(request, 'lessons/admin/lesson_form.html', {'form': form})
 
 
-@login_required
+@staff_member_required
 def admin_lesson_edit(request, pk):
     """Редактирование урока (только для админов)"""
-    if not request.user.is_staff:
-        messages.error(request, "У вас нет прав для редактирования уроков.")
-        return redirect('lesson_list')
-    
     lesson = get_object_or_404(VideoLesson, pk=pk)
     
     if request.method == 'POST':
@@ -209,59 +275,81 @@ def admin_lesson_edit(request, pk):
         if form.is_valid():
             form.save()
             messages.success(request, f"Урок '{lesson.title}' успешно обновлен.")
-            return redirect('admin_lesson_list')
+            return redirect('lessons:admin_lesson_list')
     else:
         form = VideoLessonForm(instance=lesson)
     
     return render(request, 'lessons/admin/lesson_form.html', {'form': form, 'lesson': lesson})
 
 
-@login_required
+@staff_member_required
 def manage_user_access(request, lesson_id):
     """Управление доступом пользователей к уроку"""
-    if not request.user.is_staff:
-        messages.error(request, "У вас нет прав для управления доступом.")
-        return redirect('lesson_list')
-    
     lesson = get_object_or_404(VideoLesson, id=lesson_id)
     
     if request.method == 'POST':
         form = UserAccessForm(request.POST)
         if form.is_valid():
-            access = form.save(commit=False)
-            access.lesson = lesson
-            access.granted_by = request.user
-            access.save()
-            messages.success(request, f"Доступ к уроку '{lesson.title}' предоставлен пользователю {access.user.username}.")
-            return redirect('manage_user_access', lesson_id=lesson_id)
+            users = form.cleaned_data['users']
+            expires_at = form.cleaned_data['expires_at']
+            accesses = [
+                UserAccess(lesson=lesson, user=user, granted_by=request.user, expires_at=expires_at)
+                for user in users
+            ]
+            # Один INSERT на пачку; ранее отозванные доступы активируются заново
+            UserAccess.objects.bulk_create(
+                accesses,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['user', 'lesson'],
+                update_fields=['is_active', 'expires_at', 'granted_by'],
+            )
+            messages.success(request, f"Доступ к уроку '{lesson.title}' предоставлен пользователям: {len(accesses)}.")
+            return redirect('lessons:manage_user_access', lesson_id=lesson_id)
     else:
         form = UserAccessForm()
     
-    # Получаем текущие доступы
-    current_accesses = UserAccess.objects.filter(lesson=lesson).select_related('user')
+    # Получаем текущие доступы постранично
+    lesson_accesses = UserAccess.objects.filter(lesson=lesson)
+    current_accesses = lesson_accesses.select_related('user', 'granted_by').only(
+        'id', 'granted_at', 'expires_at', 'is_active',
+        'user__username', 'user__first_name', 'user__last_name', 'user__email',
+        'granted_by__username',
+    ).order_by('-granted_at')
+    page_obj = Paginator(current_accesses, 25).get_page(request.GET.get('page'))
+    
+    # Статистика считается по всем доступам урока одним запросом
+    valid = Q(is_active=True) & (Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()))
+    stats = lesson_accesses.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=valid),
+        limited=Count('id', filter=valid & Q(expires_at__isnull=False)),
+        unlimited=Count('id', filter=valid & Q(expires_at__isnull=True)),
+    )
     
     context = {
         'lesson': lesson,
         'form': form,
-        'current_accesses': current_accesses,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'stats': stats,
     }
     
     return render(request, 'lessons/admin/manage_access.html', context)
 
 
-@login_required
+@staff_member_required
 def revoke_access(request, access_id):
     """Отзыв доступа пользователя"""
-    if not request.user.is_staff:
-        messages.error(request, "У вас нет прав для отзыва доступа.")
-        return redirect('lesson_list')
-    
-    access = get_object_or_404(UserAccess, id=access_id)
-    access.is_active = False
-    access.save()
+    access = UserAccess.objects.filter(id=access_id).values(
+        'lesson_id', 'user__username', 'lesson__title'
+    ).first()
+    if access is None:
+        raise Http404("Доступ не найден")
+    UserAccess.objects.filter(id=access_id).update(is_active=False)
     
-    messages.success(request, f"Доступ пользователя {access.user.username} к уроку '{access.lesson.title}' отозван.")
-    return redirect('manage_user_access', lesson_id=access.lesson.id)
+    messages.success(request, f"Доступ пользователя {access['user__username']} к уроку '{access['lesson__title']}' отозван.")
+    return redirect('lessons:manage_user_access', lesson_id=access['lesson_id'])
 
 
 def register(request):